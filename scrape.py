@@ -8,15 +8,28 @@ v2.1 changes from v2:
 - Pack size fallback patterns (3 patterns instead of 1)
 - Output shows guarantee count for verification
 """
+import asyncio
 import csv
+import hashlib
+import http.client
 import json
 import io
 import re
-import urllib.request
+import shutil
+import socket
+import ssl
+import sys
+import threading
 import urllib.error
 import time
 import os
+import pickle
+import random
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urljoin, urlsplit
 
 BASE = "https://www.texaslottery.com/export/sites/lottery/Games/Scratch_Offs/"
 CSV_URL = BASE + "scratchoff.csv"
@@ -25,125 +38,647 @@ WINNER_URL = BASE + "retailerswhosoldtopprizes{}.csv"
 
 UA = {"User-Agent": "Mozilla/5.0 (compatible; DataSync/2.1)"}
 
-def fetch(url, retries=3):
+# Responses are cached on disk between runs (restored by the workflow) and
+# revalidated with If-None-Match / If-Modified-Since
+CACHE_DIR = "data/cache"
+HTTP_CACHE_DIR = os.path.join(CACHE_DIR, "http")
+# How long a cached response is used without revalidating: the listing page
+# changes as games open and close, detail pages almost never
+TTL_LISTING = 30 * 60
+TTL_DETAIL = 7 * 24 * 3600
+TTL_DEFAULT = 6 * 3600
+# URLs that recently answered 404/410, with when to try them again. Guessed
+# detail URLs rarely appear later; a missing winner CSV is rechecked each
+# daily sync but not on reruns within the day
+KNOWN_404 = os.path.join(CACHE_DIR, "known_404.json")
+DETAIL_404_TTL = 7 * 24 * 3600
+WINNER_404_TTL = 20 * 3600
+# Cached parse results (HTTP cache entries and games.pkl) are tagged with the
+# parser's name and this version; bump it whenever any parser's output or
+# return shape changes so unchanged bodies re-parse
+PARSER_VERSION = 1
+# parse_csv output for the last raw.csv, plus that file's content hash
+GAMES_MEMO = os.path.join(CACHE_DIR, "games.pkl")
+
+RATE_LIMIT = 10          # requests/sec per host
+RATE_BURST = 10
+DETAIL_CONCURRENCY = 16
+WINNER_CONCURRENCY = 32
+POOL_MAXSIZE = 64        # idle keep-alive sockets kept per host
+DRAIN_LIMIT = 16 * 1024  # largest error body read to keep its connection
+RETRY_AFTER_MAX = 60     # cap on a server's Retry-After, in seconds
+PROGRESS_EVERY = 25      # fetch loops log one progress line per this many
+
+# Patterns are compiled once here rather than on every parse call
+_GAME_NO_RE = re.compile(r'Game\s*(?:No\.?|Number|#)\s*(\d{3,5})', re.IGNORECASE)
+_TICKETS_RE = re.compile(r'(?:approximately\s+)?([\d,]+)\*?\s*tickets\s+in\s+', re.IGNORECASE)
+# Pack size fallbacks and guaranteed-prize variants, tried in order. Each is
+# paired with a lowercase keyword it can't match without, checked first
+_PACK_RES = [(kw, re.compile(p, re.IGNORECASE)) for kw, p in [
+    ("pack", r'Pack\s*Size[:\s]+(\d+)'),
+    ("pack", r'(\d+)\s*tickets?\s+per\s+pack'),
+    ("pack", r'pack\s+(?:of|contains?)\s+(\d+)'),
+]]
+_GUAR_RES = [(kw, re.compile(p, re.IGNORECASE)) for kw, p in [
+    ("guaranteed", r'Guaranteed\s+(?:Total\s+)?Prize\s+Amount\s*[=:]\s*\$?([\d,]+)'),
+    ("guaranteed", r'Guaranteed\s+(?:Minimum\s+)?(?:Total\s+)?(?:Pack\s+)?(?:Prize|Payout|Return)\s*[=:]\s*\$?([\d,]+)'),
+    ("min", r'(?:Minimum|Min\.?)\s+(?:Guaranteed\s+)?(?:Pack\s+)?(?:Prize|Payout|Return)\s*[=:]\s*\$?([\d,]+)'),
+    ("guaranteed", r'(?:Each|Every)\s+pack\s+(?:is\s+)?guaranteed\s+.*?\$\s*([\d,]+)'),
+    ("guaranteed", r'guaranteed\s+(?:at least|a minimum of)\s+\$\s*([\d,]+)'),
+    ("guarantee", r'pack\s+guarantee[:\s]+\$?([\d,]+)'),
+]]
+_ODDS_RE = re.compile(r'(?:Overall\s+)?odds\s+.*?1\s+in\s+([\d.]+)', re.IGNORECASE)
+# Any href with "details" before ".html"; this also covers details.html_NNNN
+_DETAIL_HREF_RE = re.compile(r'href=["\']([^"\']*details[^"\']*\.html[^"\']*)["\']', re.IGNORECASE)
+
+class _DigitsOnly(dict):
+    """str.translate table that keeps decimal digits and deletes everything else"""
+    def __missing__(self, cp):
+        keep = cp if chr(cp).isdecimal() else None
+        self[cp] = keep
+        return keep
+
+_DIGITS_ONLY = _DigitsOnly()
+
+def _to_int(s):
+    """Integer value of the digits in `s` ("$1,000" -> 1000), 0 if none"""
+    s = s.translate(_DIGITS_ONLY)
+    return int(s) if s else 0
+
+_log_lock = threading.Lock()
+
+def log(msg):
+    """Print one line from a worker thread.
+    print() writes the text and the newline separately, so concurrent
+    calls can interleave; this does a single locked write.
+    """
+    with _log_lock:
+        sys.stdout.write(msg + "\n")
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens/sec, holding at most `capacity`.
+    The rate halves each time the host pushes back (429/503) and creeps back
+    up to its starting value as requests succeed.
+    """
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.max_rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.stamp = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def throttle(self, delay=None):
+        """Halve the rate; with `delay` (Retry-After), also hold every request that long"""
+        with self.lock:
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+            self.tokens = min(self.tokens, 1)
+            if delay:
+                self.paused_until = max(self.paused_until, time.monotonic() + delay)
+
+    def relax(self):
+        """Win back a slice of the starting rate after a success"""
+        if self.rate < self.max_rate:
+            with self.lock:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+def _bucket(url):
+    """The shared rate limiter for `url`'s host"""
+    host = urlsplit(url).netloc
+    with _buckets_lock:
+        bucket = _buckets.get(host)
+        if bucket is None:
+            bucket = _buckets[host] = TokenBucket(RATE_LIMIT, RATE_BURST)
+    return bucket
+
+# Idle keep-alive connections per (scheme, host), shared by all threads so
+# the hundreds of requests to texaslottery.com reuse a handful of sockets
+_pool = {}
+_pool_lock = threading.Lock()
+
+def _checkout(scheme, host):
+    """Take an idle pooled connection, or open a new one. Returns (conn, reused)"""
+    with _pool_lock:
+        idle = _pool.get((scheme, host))
+        if idle:
+            return idle.pop(), True
+    cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+    return cls(host, timeout=30), False
+
+def _checkin(scheme, host, conn):
+    """Return `conn` to the pool, or close it if POOL_MAXSIZE are already idle"""
+    with _pool_lock:
+        idle = _pool.setdefault((scheme, host), [])
+        if len(idle) < POOL_MAXSIZE:
+            idle.append(conn)
+            return
+    conn.close()
+
+def close_pool():
+    """Close every idle pooled connection"""
+    with _pool_lock:
+        conns = [c for idle in _pool.values() for c in idle]
+        _pool.clear()
+    for conn in conns:
+        conn.close()
+
+def _get(url, headers=UA, sink=None, max_redirects=5):
+    """GET `url` over a pooled connection, following redirects.
+    Returns (status, response headers, body bytes); raises HTTPError on 4xx/5xx.
+    `headers` is sent as-is, so it must include UA. With `sink`, a 200 body
+    is copied into that binary file instead of being returned (body is None).
+    """
+    for _ in range(max_redirects + 1):
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        while True:
+            conn, reused = _checkout(parts.scheme, parts.netloc)
+            try:
+                conn.request("GET", path, headers=headers)
+                resp = conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionError):
+                conn.close()
+                if reused:
+                    continue  # server dropped an idle socket; retry on a fresh one
+                raise
+            except Exception:
+                conn.close()
+                raise
+            break
+        location = resp.getheader("Location")
+        redirect = resp.status in (301, 302, 303, 307, 308) and location
+        keep = not resp.will_close
+        try:
+            if redirect or resp.status >= 400:
+                # Error and redirect bodies are never used: drain a short one
+                # to keep the socket, otherwise drop the socket unread
+                body = None
+                if resp.length is not None and resp.length <= DRAIN_LIMIT:
+                    resp.read()
+                else:
+                    keep = False
+            elif sink is not None and resp.status == 200:
+                shutil.copyfileobj(resp, sink)
+                body = None
+            else:
+                body = resp.read()
+        except Exception:
+            conn.close()
+            raise
+        if keep:
+            _checkin(parts.scheme, parts.netloc, conn)
+        else:
+            conn.close()
+        if redirect:
+            url = urljoin(url, location)
+            continue
+        if resp.status >= 400:
+            raise urllib.error.HTTPError(url, resp.status, resp.reason, resp.headers, None)
+        return resp.status, resp.headers, body
+    raise urllib.error.URLError(f"too many redirects: {url}")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# The resource does not exist; never answered from a stale cached copy
+GONE_STATUSES = {404, 410}
+# The host is asking us to slow down
+THROTTLE_STATUSES = {429, 503}
+
+# Name lookups that failed for good (NXDOMAIN); EAI_AGAIN is still retried
+DNS_PERMANENT = {getattr(socket, n) for n in ("EAI_NONAME", "EAI_NODATA") if hasattr(socket, n)}
+
+def _transient(e):
+    """True for failures worth retrying: network errors and 429/5xx.
+    A host that doesn't resolve or a certificate that doesn't verify won't
+    fix itself within the retry window.
+    """
+    if isinstance(e, urllib.error.HTTPError):
+        return e.code in RETRY_STATUSES
+    if isinstance(e, socket.gaierror):
+        return e.errno not in DNS_PERMANENT
+    if isinstance(e, ssl.SSLCertVerificationError):
+        return False
+    return isinstance(e, (OSError, http.client.HTTPException))
+
+def _retry_after(e):
+    """Seconds asked for by the Retry-After header of HTTPError `e`, or None"""
+    value = e.headers.get("Retry-After") if e.headers else None
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(RETRY_AFTER_MAX, max(0.0, delay))
+
+def _retrying(url, retries, call):
+    """Run call() up to `retries` times, paced by the rate limiter.
+    Transient failures back off exponentially with jitter; anything else
+    (404, bad URL, ...) gives up at once. A 429/503 also slows the host's
+    bucket, pausing it for any Retry-After. Returns the result, or None.
+    """
+    bucket = _bucket(url)
     for i in range(retries):
+        bucket.acquire()
         try:
-            req = urllib.request.Request(url, headers=UA)
-            with urllib.request.urlopen(req, timeout=30) as resp:
-                return resp.read().decode("utf-8", errors="replace")
+            result = call()
         except Exception as e:
-            print(f"  Retry {i+1}/{retries}: {e}")
-            time.sleep(2 * (i + 1))
+            if not _transient(e):
+                log(f"  Failed: {e}")
+                return None
+            log(f"  Retry {i+1}/{retries}: {e}")
+            delay = None
+            if isinstance(e, urllib.error.HTTPError) and e.code in THROTTLE_STATUSES:
+                delay = _retry_after(e)
+                bucket.throttle(delay)
+            # With Retry-After the bucket itself holds the next attempt
+            if i + 1 < retries and delay is None:
+                time.sleep(min(30, 2 ** i + random.random()))
+            continue
+        bucket.relax()
+        return result
     return None
 
-def parse_csv(text):
-    """Parse scratchoff.csv for prize tier data per game"""
+def write_json(path, obj):
+    """Write `obj` as compact JSON.
+    json.dumps runs the C encoder in one shot; json.dump(obj, f) streams
+    through the much slower pure-Python encoder.
+    """
+    with open(path, "w") as f:
+        f.write(json.dumps(obj, separators=(",", ":")))
+
+def _cache_path(url):
+    return os.path.join(HTTP_CACHE_DIR, hashlib.sha1(url.encode()).hexdigest() + ".json")
+
+def _cache_get(url):
+    """Cached entry {"fetched", "etag", "modified", "digest", "body"[, "parsed", "parser"]}
+    for `url`, or None
+    """
+    try:
+        with open(_cache_path(url)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _cache_put(url, entry):
+    os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+    path = _cache_path(url)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    write_json(tmp, entry)
+    os.replace(tmp, path)
+
+def _cache_ttl(url):
+    """Seconds a cached response for `url` is served without revalidating"""
+    if url == INDEX_URL:
+        return TTL_LISTING
+    if "details" in url:
+        return TTL_DETAIL
+    return TTL_DEFAULT
+
+def _cache_fresh(url, entry):
+    """True if `entry` for `url` was fetched or revalidated within its TTL.
+    That time is kept in the entry, not the file's mtime, so rewriting the
+    file for a re-parse doesn't make it look fresh.
+    """
+    return time.time() - entry.get("fetched", 0) < _cache_ttl(url)
+
+_known_404 = None
+_known_404_lock = threading.Lock()
+
+def _known_404s():
+    """The unexpired known-404 records {url: retry-after time}, loaded on first use"""
+    global _known_404
+    with _known_404_lock:
+        if _known_404 is None:
+            try:
+                with open(KNOWN_404) as f:
+                    records = json.load(f)
+            except (OSError, ValueError):
+                records = {}
+            now = time.time()
+            _known_404 = {u: t for u, t in records.items() if t > now}
+        return _known_404
+
+def save_known_404():
+    """Write the known-404 records back, if any were loaded"""
+    if _known_404 is None:
+        return
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with _known_404_lock:
+        write_json(KNOWN_404, _known_404)
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def _fetch_entry(url, retries=3, remember_404=0):
+    """Revalidate `url` against the disk cache.
+    Returns (entry, changed): the cached entry with changed=False while it is
+    within its TTL or if the fetch fails (stale-if-error); the cached entry
+    with its revalidation time updated and changed=True on a 304; a new
+    entry to store with changed=True on a 200; or (None, False).
+    A 200 whose body hashes the same as the cached one keeps its "parsed".
+    With `remember_404` (seconds), a 404/410 is recorded and the URL is not
+    requested again for that long.
+    """
+    if remember_404 and _known_404s().get(url, 0) > time.time():
+        return None, False
+    cached = _cache_get(url)
+    if cached and _cache_fresh(url, cached):
+        return cached, False
+    headers = dict(UA)
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("modified"):
+            headers["If-Modified-Since"] = cached["modified"]
+
+    def get():
+        try:
+            return _get(url, headers)
+        except urllib.error.HTTPError as e:
+            if e.code not in GONE_STATUSES:
+                raise
+            log(f"  Failed: {e}")
+            return e.code, e.headers, None
+
+    result = _retrying(url, retries, get)
+    if result is None:
+        # Network trouble or a server error: keep serving the last good copy
+        if cached:
+            log(f"  Using cached copy of {url}")
+        return cached, False
+    status, resp_headers, body = result
+    if status in GONE_STATUSES:
+        if remember_404:
+            known = _known_404s()
+            with _known_404_lock:
+                known[url] = time.time() + remember_404
+        return None, False
+    if status == 304 and cached:
+        cached["fetched"] = time.time()
+        return cached, True
+    entry = {"fetched": time.time(),
+             "etag": resp_headers.get("ETag"),
+             "modified": resp_headers.get("Last-Modified"),
+             "digest": _digest(body),
+             "body": body.decode("utf-8", errors="replace")}
+    if cached and "parsed" in cached and cached.get("digest") == entry["digest"]:
+        entry["parsed"] = cached["parsed"]
+        entry["parser"] = cached.get("parser")
+    return entry, True
+
+def _parser_tag(parse):
+    return f"{parse.__name__}:{PARSER_VERSION}"
+
+def _has_parse(entry, parse):
+    """True if `entry` holds a result made by `parse` at the current PARSER_VERSION"""
+    return "parsed" in entry and entry.get("parser") == _parser_tag(parse)
+
+def _set_parse(entry, parse, result):
+    entry["parsed"] = result
+    entry["parser"] = _parser_tag(parse)
+
+def fetch(url, retries=3):
+    entry, changed = _fetch_entry(url, retries)
+    if entry is None:
+        return None
+    if changed:
+        _cache_put(url, entry)
+    return entry["body"]
+
+class _HashingSink:
+    """Binary file wrapper that hashes everything written through it"""
+    def __init__(self, f):
+        self.f = f
+        self.hash = hashlib.blake2b(digest_size=16)
+
+    def write(self, data):
+        self.hash.update(data)
+        return self.f.write(data)
+
+def fetch_to_file(url, path, retries=3):
+    """Stream `url` straight to `path` without holding the body in memory.
+    Downloads to a temp file first so a failed fetch keeps the old copy.
+    The body is hashed as it streams; returns its digest, or None on failure.
+    """
+    tmp = path + ".part"
+
+    def download():
+        with open(tmp, "wb") as f:
+            sink = _HashingSink(f)
+            _get(url, sink=sink)
+        os.replace(tmp, path)
+        return sink.hash.hexdigest()
+
+    digest = _retrying(url, retries, download)
+    if digest is None and os.path.exists(tmp):
+        os.remove(tmp)
+    return digest
+
+def fetch_parsed(url, parse, retries=3, remember_404=0):
+    """Fetch `url` and return parse(body), or None if the fetch failed.
+    The parse result is cached alongside the body, so a 304 or a
+    byte-identical 200 skips re-parsing unless `parse` or PARSER_VERSION
+    differs from the one that made it.
+    """
+    entry, changed = _fetch_entry(url, retries, remember_404)
+    if entry is None:
+        return None
+    if not _has_parse(entry, parse):
+        _set_parse(entry, parse, parse(entry["body"]))
+        changed = True
+    if changed:
+        _cache_put(url, entry)
+    return entry["parsed"]
+
+def load_games(path, digest=None):
+    """parse_csv() of the CSV at `path`, memoized by the file's content hash
+    and the parser version.
+    Pass the digest from fetch_to_file to skip re-reading the file for it.
+    """
+    if digest is None:
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+    key = f"{_parser_tag(parse_csv)}:{digest}"
+    try:
+        with open(GAMES_MEMO + ".meta") as f:
+            if f.read().strip() == key:
+                with open(GAMES_MEMO, "rb") as g:
+                    return pickle.load(g)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        pass
+    with open(path, encoding="utf-8", errors="replace", newline="") as f:
+        parsed = parse_csv(f)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # The meta goes first and comes back last, each file via a temp file, so
+    # a run that dies midway never leaves an old key beside a new pickle
+    try:
+        os.remove(GAMES_MEMO + ".meta")
+    except FileNotFoundError:
+        pass
+    # One pickle keeps the list and the dict sharing the same game dicts
+    with open(GAMES_MEMO + ".tmp", "wb") as f:
+        pickle.dump(parsed, f, protocol=5)
+    os.replace(GAMES_MEMO + ".tmp", GAMES_MEMO)
+    with open(GAMES_MEMO + ".meta.tmp", "w") as f:
+        f.write(key)
+    os.replace(GAMES_MEMO + ".meta.tmp", GAMES_MEMO + ".meta")
+    return parsed
+
+def _column_indices(header, names):
+    """Position of each of `names` in `header`, resolved once per file.
+    Missing columns map to len(header), the slot _fit_row fills with "".
+    """
+    pos = {h: i for i, h in enumerate(header)}
+    return [pos.get(n, len(header)) for n in names]
+
+def _fit_row(row, n):
+    """Trim/pad `row` to the n header columns plus one trailing "" slot"""
+    if len(row) != n:
+        row = row[:n] + [""] * (n - len(row))
+    row.append("")
+    return row
+
+_PRIZE_AMOUNT = itemgetter("a")
+
+def parse_csv(source):
+    """Parse scratchoff.csv for prize tier data per game.
+    `source` is the CSV text or any iterable of lines, e.g. a file opened
+    with newline="". Returns (game_list, games): the game dicts in CSV order,
+    ready for output, and the same dicts keyed by game number.
+    """
+    game_list = []
     games = {}
-    lines = text.strip().replace("\r\n", "\n").split("\n")
-    start = 0
-    for i, line in enumerate(lines):
-        if "Game Number" in line:
-            start = i
-            break
-    reader = csv.reader(io.StringIO("\n".join(lines[start:])))
+    # skipinitialspace lets the reader unquote `, "Name"` cells itself
+    reader = csv.reader(io.StringIO(source) if isinstance(source, str) else source,
+                        skipinitialspace=True)
     header = None
+    to_int, fit_row = _to_int, _fit_row  # locals for the per-row loop
     for row in reader:
         if not header:
-            header = [h.strip() for h in row]
+            # Skip the "Scratch-Off Prizes as of ..." preamble up to the header row
+            if any("Game Number" in c for c in row):
+                header = [h.strip() for h in row]
+                n = len(header)
+                i_gn, i_nm, i_pr, i_close, i_level, i_tot, i_claim = _column_indices(header, [
+                    "Game Number", "Game Name", "Ticket Price", "Game Close Date",
+                    "Prize Level", "Total Prizes in Level", "Prizes Claimed"])
             continue
         if len(row) < 7:
             continue
-        d = dict(zip(header, [c.strip().strip('"') for c in row]))
-        gn_str = d.get("Game Number", "").strip()
+        row = fit_row(row, n)
+        gn_str = row[i_gn].strip()
         if not gn_str or not gn_str.isdigit():
             continue
         gn = int(gn_str)
-        if gn not in games:
-            nm = d.get("Game Name", "")
-            pr_str = d.get("Ticket Price", "0")
-            pr = int(re.sub(r'[^\d]', '', pr_str) or "0")
-            close_date = d.get("Game Close Date", "").strip()
+        g = games.get(gn)
+        if g is None:
+            nm = row[i_nm].strip()
+            pr = to_int(row[i_pr])
+            close_date = row[i_close].strip()
             cs = 1 if close_date else 0
-            games[gn] = {"gn": gn, "nm": nm, "pr": pr, "cs": cs,
-                         "close_date": close_date, "tot": 0, "odds": 0,
-                         "pk": 0, "guar": 0, "pz": []}
-        level = d.get("Prize Level", "").strip()
-        total_in_level = d.get("Total Prizes in Level", "0").strip().replace(",", "")
-        claimed = d.get("Prizes Claimed", "0").strip().replace(",", "")
-        tp = int(re.sub(r'[^\d]', '', total_in_level) or "0")
-        cl = int(re.sub(r'[^\d]', '', claimed) or "0")
+            g = games[gn] = {"gn": gn, "nm": nm, "pr": pr, "cs": cs,
+                             "close_date": close_date, "tot": 0, "odds": 0,
+                             "pk": 0, "guar": 0, "pz": []}
+            game_list.append(g)
+        level = row[i_level].strip()
+        tp = to_int(row[i_tot])
+        cl = to_int(row[i_claim])
         if level.upper() == "TOTAL":
             pass  # Skip total row
         else:
-            pa = int(re.sub(r'[^\d]', '', level) or "0")
+            pa = to_int(level)
             if pa > 0 and tp > 0:
-                games[gn]["pz"].append({"a": pa, "p": tp, "c": cl})
-    for g in games.values():
-        g["pz"].sort(key=lambda x: -x["a"])
-    return games
+                g["pz"].append({"a": pa, "p": tp, "c": cl})
+    for g in game_list:
+        g["pz"].sort(key=_PRIZE_AMOUNT, reverse=True)
+    return game_list, games
 
 def parse_detail_page(html):
     """Extract game metadata from a detail page"""
     info = {}
-    m = re.search(r'Game\s*(?:No\.?|Number|#)\s*(\d{3,5})', html, re.IGNORECASE)
-    if m:
-        info["gn"] = int(m.group(1))
-    m = re.search(r'(?:approximately\s+)?([\d,]+)\*?\s*tickets\s+in\s+', html, re.IGNORECASE)
-    if m:
-        info["tot"] = int(m.group(1).replace(",", ""))
+    # Cheap substring checks gate each regex scan of the whole page
+    low = html.lower()
+    if not html.isascii():
+        # re.IGNORECASE also folds these onto ASCII i/s; keep the gates sound
+        low = low.replace("i\u0307", "i").replace("\u0131", "i").replace("\u017f", "s")
+    if "game" in low:
+        m = _GAME_NO_RE.search(html)
+        if m:
+            info["gn"] = int(m.group(1))
+    if "tickets" in low:
+        m = _TICKETS_RE.search(html)
+        if m:
+            info["tot"] = _to_int(m.group(1))
 
     # Pack size — v2.1: multiple fallback patterns
-    for pat in [
-        r'Pack\s*Size[:\s]+(\d+)',
-        r'(\d+)\s*tickets?\s+per\s+pack',
-        r'pack\s+(?:of|contains?)\s+(\d+)',
-    ]:
-        m = re.search(pat, html, re.IGNORECASE)
+    for kw, pat in _PACK_RES:
+        if kw not in low:
+            continue
+        m = pat.search(html)
         if m:
             info["pk"] = int(m.group(1))
             break
 
     # Guaranteed prize — v2.1: expanded patterns for all game types ($2-$100)
-    for pat in [
-        r'Guaranteed\s+(?:Total\s+)?Prize\s+Amount\s*[=:]\s*\$?([\d,]+)',
-        r'Guaranteed\s+(?:Minimum\s+)?(?:Total\s+)?(?:Pack\s+)?(?:Prize|Payout|Return)\s*[=:]\s*\$?([\d,]+)',
-        r'(?:Minimum|Min\.?)\s+(?:Guaranteed\s+)?(?:Pack\s+)?(?:Prize|Payout|Return)\s*[=:]\s*\$?([\d,]+)',
-        r'(?:Each|Every)\s+pack\s+(?:is\s+)?guaranteed\s+.*?\$\s*([\d,]+)',
-        r'guaranteed\s+(?:at least|a minimum of)\s+\$\s*([\d,]+)',
-        r'pack\s+guarantee[:\s]+\$?([\d,]+)',
-    ]:
-        m = re.search(pat, html, re.IGNORECASE)
+    for kw, pat in _GUAR_RES:
+        if kw not in low:
+            continue
+        m = pat.search(html)
         if m:
-            val = int(m.group(1).replace(",", ""))
+            val = _to_int(m.group(1))
             if val > 0:
                 info["guar"] = val
                 break
 
-    m = re.search(r'(?:Overall\s+)?odds\s+.*?1\s+in\s+([\d.]+)', html, re.IGNORECASE)
-    if m:
-        info["odds"] = float(m.group(1))
+    if "odds" in low:
+        m = _ODDS_RE.search(html)
+        if m:
+            info["odds"] = float(m.group(1))
     return info
 
+def _parse_full_detail_page(html):
+    """parse_detail_page, or None for stub pages too short to be a real game"""
+    return parse_detail_page(html) if len(html) >= 200 else None
+
 def find_detail_urls(html):
-    """Extract detail page URLs from index page"""
-    urls = []
-    patterns = [
-        r'href=["\']([^"\']*details\.html_[^"\']+)["\']',
-        r'href=["\']([^"\']*details[^"\']*\.html[^"\']*)["\']',
-    ]
-    seen = set()
-    for pat in patterns:
-        for m in re.finditer(pat, html, re.IGNORECASE):
-            url = m.group(1)
-            if url not in seen and "details" in url.lower():
-                seen.add(url)
-                if url.startswith("http"):
-                    urls.append(url)
-                elif url.startswith("/"):
-                    urls.append("https://www.texaslottery.com" + url)
-                else:
-                    urls.append(BASE + url)
-    return list(set(urls))
+    """Extract detail page URLs from index page, deduped in page order"""
+    urls = {}
+    for m in _DETAIL_HREF_RE.finditer(html):
+        url = m.group(1)
+        if url.startswith("http"):
+            urls[url] = None
+        elif url.startswith("/"):
+            urls["https://www.texaslottery.com" + url] = None
+        else:
+            urls[BASE + url] = None
+    return list(urls)
 
 def fetch_detail_for_games(games):
     """Fetch detail pages for all games missing metadata.
@@ -162,13 +697,17 @@ def fetch_detail_for_games(games):
     matched = 0
     matched_gns = set()
 
-    # Fetch URLs from index page
-    for i, url in enumerate(detail_urls):
-        print(f"  Detail {i+1}/{len(detail_urls)}...")
-        html = fetch(url)
-        if not html:
+    # Fetch URLs from index page concurrently; merge results in index order
+    def fetch_info(i, url):
+        if i % PROGRESS_EVERY == 0 or i + 1 == len(detail_urls):
+            log(f"  Detail {i+1}/{len(detail_urls)}...")
+        return fetch_parsed(url, parse_detail_page)
+
+    with ThreadPoolExecutor(max_workers=DETAIL_CONCURRENCY) as ex:
+        infos = list(ex.map(fetch_info, range(len(detail_urls)), detail_urls))
+    for info in infos:
+        if not info:
             continue
-        info = parse_detail_page(html)
         gn = info.get("gn")
         if gn and gn in games:
             g = games[gn]
@@ -178,75 +717,141 @@ def fetch_detail_for_games(games):
             if info.get("odds"): g["odds"] = info["odds"]
             matched += 1
             matched_gns.add(gn)
-        time.sleep(0.5)
 
     # Step 2: direct URL pattern for games still missing data
     missing = [gn for gn, g in games.items()
                if gn not in matched_gns and (g["tot"] == 0 or g["pk"] == 0)]
     if missing:
         print(f"  Trying direct URLs for {len(missing)} games still missing data...")
-        for gn in missing:
-            # Try common URL patterns
+
+        # Games are probed concurrently; each tries its URL patterns in turn
+        def probe(gn):
             patterns = [
                 f"{BASE}details.html_{gn}.html",
                 f"{BASE}details_{gn}.html",
             ]
             for url in patterns:
-                html = fetch(url)
-                if not html or len(html) < 200:
+                # Most guessed URLs don't exist; don't re-probe those every run
+                info = fetch_parsed(url, _parse_full_detail_page, remember_404=DETAIL_404_TTL)
+                if info is None:
                     continue
-                info = parse_detail_page(html)
                 if info.get("gn") == gn or info.get("tot"):
-                    g = games[gn]
-                    if info.get("tot"): g["tot"] = info["tot"]
-                    if info.get("pk"): g["pk"] = info["pk"]
-                    if info.get("guar"): g["guar"] = info["guar"]
-                    if info.get("odds"): g["odds"] = info["odds"]
-                    matched += 1
-                    print(f"    #{gn} matched via direct URL")
-                    break
-                time.sleep(0.3)
-            time.sleep(0.3)
+                    return info
+            return None
+
+        with ThreadPoolExecutor(max_workers=DETAIL_CONCURRENCY) as ex:
+            infos = list(ex.map(probe, missing))
+        for gn, info in zip(missing, infos):
+            if not info:
+                continue
+            g = games[gn]
+            if info.get("tot"): g["tot"] = info["tot"]
+            if info.get("pk"): g["pk"] = info["pk"]
+            if info.get("guar"): g["guar"] = info["guar"]
+            if info.get("odds"): g["odds"] = info["odds"]
+            matched += 1
+            print(f"    #{gn} matched via direct URL")
 
     return matched
 
-def fetch_winners(game_numbers):
-    """Fetch winner/retailer CSVs"""
-    all_w = {}
-    for gn in game_numbers:
+def parse_winner_csv(text):
+    """Parse one retailer/winner CSV into winner records"""
+    entries = []
+    append, to_int, fit_row = entries.append, _to_int, _fit_row  # locals for the per-row loop
+    try:
+        reader = csv.reader(io.StringIO(text))
+        header = None
+        for row in reader:
+            if not header:
+                if not row:
+                    continue  # blank line(s) before the header
+                header = [h.strip() for h in row]
+                n = len(header)
+                i_date, i_store, i_addr, i_city, i_zip, i_pn, i_tk = _column_indices(header, [
+                    "Date Claimed", "Selling Retailer", "Selling Retailer Address",
+                    "Selling Retailer City", "Selling Retailer Zip Code",
+                    "Pack Number", "Ticket Number"])
+                if i_date == n or i_store == n:
+                    # Not a winner CSV (e.g. an HTML error page served as 200):
+                    # every row would be skipped, so stop before reading them
+                    log(f"    Unexpected header: {header[:3]}")
+                    return entries
+                continue
+            if len(row) < 5:
+                continue
+            row = fit_row(row, n)
+            date = row[i_date].strip()
+            store = row[i_store].strip()
+            if not date or not store:
+                continue
+            append({
+                "date": date,
+                "store": store,
+                "addr": row[i_addr].strip(),
+                "city": row[i_city].strip(),
+                "zip": row[i_zip].strip(),
+                "pn": to_int(row[i_pn]),
+                "tk": to_int(row[i_tk]),
+            })
+    except Exception as e:
+        log(f"    Parse error: {e}")
+    return entries
+
+_WINNER_STR_FIELDS = ("date", "store", "addr", "city", "zip")
+
+def _intern_winners(entries):
+    """Intern the repeated string fields of winner records in place.
+    Retailer names, addresses, cities, zips and dates repeat heavily across
+    records and games; records loaded from the JSON cache would otherwise
+    each carry their own copies.
+    """
+    intern = sys.intern
+    for e in entries:
+        for k in _WINNER_STR_FIELDS:
+            e[k] = intern(e[k])
+    return entries
+
+async def fetch_winners_async(game_numbers):
+    """Fetch winner/retailer CSVs concurrently.
+    At most WINNER_CONCURRENCY requests are in flight; fetch() paces them
+    through the per-host token bucket.
+    """
+    loop = asyncio.get_running_loop()
+    sem = asyncio.Semaphore(WINNER_CONCURRENCY)
+    done = 0
+
+    async def worker(gn, pool):
+        nonlocal done
         url = WINNER_URL.format(gn)
-        print(f"  Winners #{gn}...")
-        text = fetch(url)
+        async with sem:
+            entry, changed = await loop.run_in_executor(
+                pool, _fetch_entry, url, 3, WINNER_404_TTL)
+        done += 1
+        if done % PROGRESS_EVERY == 0 or done == len(game_numbers):
+            log(f"  Winners {done}/{len(game_numbers)}...")
+        if entry is None:
+            return gn, None
+        text = entry["body"]
         if not text or "404" in text[:100].lower() or "not found" in text[:200].lower():
-            continue
-        entries = []
-        try:
-            reader = csv.reader(io.StringIO(text))
-            header = None
-            for row in reader:
-                if not header:
-                    header = [h.strip() for h in row]
-                    continue
-                if len(row) < 5:
-                    continue
-                d = dict(zip(header, [c.strip() for c in row]))
-                w = {
-                    "date": d.get("Date Claimed", ""),
-                    "store": d.get("Selling Retailer", ""),
-                    "addr": d.get("Selling Retailer Address", ""),
-                    "city": d.get("Selling Retailer City", ""),
-                    "zip": d.get("Selling Retailer Zip Code", ""),
-                    "pn": int(re.sub(r'[^\d]', '', d.get("Pack Number", "0")) or "0"),
-                    "tk": int(re.sub(r'[^\d]', '', d.get("Ticket Number", "0")) or "0"),
-                }
-                if w["date"] and w["store"]:
-                    entries.append(w)
-        except Exception as e:
-            print(f"    Parse error: {e}")
+            entries = None
+        else:
+            # Unchanged CSVs (304 or same hash) reuse the cached parse. Parsing
+            # all of them takes well under 0.1s, less than starting one worker
+            # process, so it stays on a thread
+            if not _has_parse(entry, parse_winner_csv):
+                _set_parse(entry, parse_winner_csv,
+                           await loop.run_in_executor(None, parse_winner_csv, text))
+                changed = True
+            entries = entry["parsed"]
+        if changed:
+            await loop.run_in_executor(pool, _cache_put, url, entry)
         if entries:
-            all_w[str(gn)] = entries
-        time.sleep(0.5)
-    return all_w
+            _intern_winners(entries)
+        return gn, entries
+
+    with ThreadPoolExecutor(max_workers=WINNER_CONCURRENCY) as pool:
+        results = await asyncio.gather(*[worker(gn, pool) for gn in game_numbers])
+    return {str(gn): entries for gn, entries in results if entries}
 
 def main():
     os.makedirs("data", exist_ok=True)
@@ -255,13 +860,11 @@ def main():
 
     # Step 1: CSV
     print("Step 1: Fetching prize data CSV...")
-    csv_text = fetch(CSV_URL)
-    games = {}
-    if csv_text:
-        games = parse_csv(csv_text)
+    game_list, games = [], {}
+    digest = fetch_to_file(CSV_URL, "data/raw.csv")
+    if digest:
+        game_list, games = load_games("data/raw.csv", digest)
         print(f"  Parsed {len(games)} games")
-        with open("data/raw.csv", "w") as f:
-            f.write(csv_text)
     if not games:
         print("ERROR: No CSV data")
         return
@@ -271,9 +874,23 @@ def main():
     matched = fetch_detail_for_games(games)
     print(f"  Matched metadata for {matched} games")
 
-    missing = [g for g in games.values() if g["tot"] == 0 or g["pk"] == 0]
-    # v2.1: warn about missing guarantees specifically
-    missing_guar = [g for g in games.values() if g["guar"] == 0 and g["tot"] > 0]
+    # One pass over the games for the warnings, the winner list and the stats;
+    # nothing below changes these fields
+    missing, missing_guar, with_claims = [], [], []
+    has_tot = has_pk = has_guar = 0
+    for gn, g in games.items():
+        tot, pk, guar = g["tot"], g["pk"], g["guar"]
+        if tot == 0 or pk == 0:
+            missing.append(g)
+        # v2.1: warn about missing guarantees specifically
+        if guar == 0 and tot > 0:
+            missing_guar.append(g)
+        if g["pz"] and g["pz"][0]["c"] > 0:
+            with_claims.append(gn)
+        has_tot += tot > 0
+        has_pk += pk > 0
+        # v2.1: show guarantee count
+        has_guar += guar > 0
     if missing:
         print(f"  WARNING: {len(missing)} games still missing detail data")
         for g in missing[:10]:
@@ -284,31 +901,25 @@ def main():
             print(f"    #{g['gn']} {g['nm']} (${g['pr']})")
 
     # Step 3: Winners
-    with_claims = [gn for gn, g in games.items() if g["pz"] and g["pz"][0]["c"] > 0]
     print(f"Step 3: Fetching winner data for {len(with_claims)} games...")
-    winners = fetch_winners(with_claims)
+    winners = asyncio.run(fetch_winners_async(with_claims))
     print(f"  Got winners for {len(winners)} games")
 
     # Output
     output = {
         "updated": now,
         "game_count": len(games),
-        "games": list(games.values()),
+        "games": game_list,
         "winners": winners,
         "winner_count": sum(len(v) for v in winners.values()),
     }
 
-    with open("data/feed.json", "w") as f:
-        json.dump(output, f, separators=(",", ":"))
+    write_json("data/feed.json", output)
     print(f"Saved data/feed.json ({os.path.getsize('data/feed.json')} bytes)")
 
-    with open("data/wdata.json", "w") as f:
-        json.dump({"updated": now, "winners": winners}, f, separators=(",", ":"))
+    write_json("data/wdata.json", {"updated": now, "winners": winners})
+    save_known_404()
 
-    has_tot = sum(1 for g in games.values() if g.get("tot", 0) > 0)
-    has_pk = sum(1 for g in games.values() if g.get("pk", 0) > 0)
-    # v2.1: show guarantee count
-    has_guar = sum(1 for g in games.values() if g.get("guar", 0) > 0)
     print(f"\n=== Done ===")
     print(f"  Games: {len(games)}")
     print(f"  With total tickets: {has_tot}")
@@ -317,4 +928,7 @@ def main():
     print(f"  Winner records: {output['winner_count']}")
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        close_pool()